@@ -121,6 +121,9 @@ class SentinairEngine:
         if hasattr(self, 'processing_thread'):
             self.processing_thread.join(timeout=5)
             
+        # Persist anything still queued for the database
+        self.db_manager.flush()
+            
     def run_stealth_mode(self):
         """Run in stealth mode (background)"""
         self.stealth_mode = True
@@ -284,15 +287,12 @@ class SentinairEngine:
         return descriptions.get(event.event_type, "Unknown anomaly detected")
         
     def _store_event(self, event: DetectionEvent):
-        """Store event in database"""
+        """Queue event for batched storage in the database"""
         try:
-            # Sanitize event data to remove datetime objects
-            sanitized_event_data = sanitize_datetime_objects(event.data)
-            
             event_data = {
                 'timestamp': event.timestamp.isoformat(),
                 'event_type': event.event_type,
-                'event_data': safe_json_dumps(sanitized_event_data),
+                'event_data': safe_json_dumps(event.data),
                 'risk_score': event.risk_score,
                 'is_anomaly': event.is_anomaly
             }
@@ -301,7 +301,7 @@ class SentinairEngine:
             if self.config.get('security', {}).get('encrypt_logs', True):
                 event_data['event_data'] = self.encryption.encrypt(event_data['event_data'])
             
-            self.db_manager.insert_event(event_data)
+            self.db_manager.queue_event(event_data)
             
         except Exception as e:
             self.logger.error(f"Error storing event: {e}")
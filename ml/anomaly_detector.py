@@ -7,7 +7,7 @@ import os
 import pickle
 import logging
 import numpy as np
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Union
 from datetime import datetime
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
@@ -27,6 +27,9 @@ class AnomalyDetector:
         self.contamination_rate = ml_config.get('contamination_rate', 0.1)
         self.n_estimators = ml_config.get('n_estimators', 100)
         self.random_state = ml_config.get('random_state', 42)
+        self.n_jobs = ml_config.get('n_jobs', -1)
+        self.max_samples = ml_config.get('max_samples', 'auto')  # 'auto' = min(256, n_samples)
+        self.device = ml_config.get('device', 'cpu')  # cpu, cuda
         
         # Model components
         self.model = None
@@ -40,8 +43,8 @@ class AnomalyDetector:
         # Training history
         self.training_history = []
         
-    def train(self, features: List[List[float]]) -> bool:
-        """Train the anomaly detection model"""
+    def train(self, features: Union[List[List[float]], np.ndarray]) -> bool:
+        """Train the anomaly detection model from a list of feature rows or a 2D array"""
         try:
             self.logger.info(f"Training {self.model_type} model with {len(features)} samples")
             
@@ -49,11 +52,12 @@ class AnomalyDetector:
                 self.logger.warning("Insufficient training data")
                 return False
                 
-            # Convert to numpy array
-            X = np.array(features)
+            # Arrays are used as-is; lists are converted once to float32
+            owns_array = not isinstance(features, np.ndarray)
+            X = np.asarray(features, dtype=np.float32) if owns_array else features
             
-            # Handle NaN values
-            X = np.nan_to_num(X, nan=0.0, posinf=1e10, neginf=-1e10)
+            # Handle NaN values (in place unless the array belongs to the caller)
+            X = np.nan_to_num(X, copy=not owns_array, nan=0.0, posinf=1e10, neginf=-1e10)
             
             # Feature scaling
             self.scaler = StandardScaler()
@@ -61,12 +65,7 @@ class AnomalyDetector:
             
             # Initialize and train model
             if self.model_type == 'isolation_forest':
-                self.model = IsolationForest(
-                    contamination=self.contamination_rate,
-                    n_estimators=self.n_estimators,
-                    random_state=self.random_state,
-                    n_jobs=-1
-                )
+                self.model = self._create_isolation_forest()
             else:
                 raise ValueError(f"Unsupported model type: {self.model_type}")
                 
@@ -78,8 +77,8 @@ class AnomalyDetector:
             training_info = {
                 'timestamp': datetime.now(),
                 'model_type': self.model_type,
-                'n_samples': len(features),
-                'n_features': len(features[0]) if features else 0,
+                'n_samples': X.shape[0],
+                'n_features': X.shape[1] if X.ndim > 1 else 0,
                 'contamination_rate': self.contamination_rate
             }
             self.training_history.append(training_info)
@@ -91,6 +90,26 @@ class AnomalyDetector:
             self.logger.error(f"Error training model: {e}")
             return False
             
+    def _create_isolation_forest(self):
+        """Create an Isolation Forest on the configured device"""
+        params = {
+            'contamination': self.contamination_rate,
+            'n_estimators': self.n_estimators,
+            'random_state': self.random_state,
+            'max_samples': self.max_samples
+        }
+        
+        if self.device == 'cuda':
+            # Imported here so CPU-only runs never load RAPIDS/CUDA
+            try:
+                from cuml.ensemble import IsolationForest as CuIsolationForest
+                self.logger.info("Using cuML GPU Isolation Forest")
+                return CuIsolationForest(**params)
+            except ImportError:
+                self.logger.warning("ml.device is 'cuda' but cuML is not available, using scikit-learn")
+            
+        return IsolationForest(n_jobs=self.n_jobs, **params)
+        
     def predict(self, features: List[float]) -> Tuple[bool, float]:
         """Predict if given features represent an anomaly"""
         try:
@@ -107,14 +126,12 @@ class AnomalyDetector:
             # Scale features
             X_scaled = self.scaler.transform(X)
             
-            # Make prediction
-            prediction = self.model.predict(X_scaled)[0]
-            
-            # Get anomaly score (confidence)
+            # Get anomaly score; predict() labels a sample -1 exactly when this is negative,
+            # so one pass over the forest gives both the label and the confidence
             anomaly_score = self.model.decision_function(X_scaled)[0]
             
             # Convert to interpretable format
-            is_anomaly = prediction == -1
+            is_anomaly = bool(anomaly_score < 0)
             confidence = self._convert_anomaly_score(anomaly_score)
             
             return is_anomaly, confidence
@@ -123,6 +140,24 @@ class AnomalyDetector:
             self.logger.error(f"Error making prediction: {e}")
             return False, 0.0
             
+    def predict_batch(self, features: Union[List[List[float]], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict anomalies for many feature rows with a single scoring pass"""
+        if not self.is_trained():
+            self.logger.warning("Model not trained, cannot make predictions")
+            return np.zeros(0, dtype=bool), np.zeros(0)
+            
+        X = np.asarray(features, dtype=np.float32)
+        X = np.nan_to_num(X, nan=0.0, posinf=1e10, neginf=-1e10)
+        X_scaled = self.scaler.transform(X)
+        
+        # The forest accumulates per-tree path lengths into one (n_samples,) vector,
+        # scoring in row chunks bounded by sklearn's working_memory setting
+        anomaly_scores = self.model.decision_function(X_scaled)
+        
+        is_anomaly = anomaly_scores < 0
+        confidences = (np.clip(-anomaly_scores, -1, 1) + 1) / 2
+        return is_anomaly, confidences
+            
     def _convert_anomaly_score(self, score: float) -> float:
         """Convert anomaly score to confidence value between 0 and 1"""
         # Isolation Forest scores are typically between -1 and 1
@@ -230,7 +265,10 @@ class AnomalyDetector:
             'is_trained': self.is_trained(),
             'model_type': self.model_type,
             'contamination_rate': self.contamination_rate,
-            'n_estimators': self.n_estimators
+            'n_estimators': self.n_estimators,
+            'max_samples': self.max_samples,
+            'n_jobs': self.n_jobs,
+            'device': self.device
         }
         
         if self.training_history:
@@ -249,17 +287,11 @@ class AnomalyDetector:
             if not self.is_trained():
                 return {'error': 'Model not trained'}
                 
-            predictions = []
-            confidences = []
-            
-            for features in test_features:
-                is_anomaly, confidence = self.predict(features)
-                predictions.append(is_anomaly)
-                confidences.append(confidence)
+            predictions, confidences = self.predict_batch(test_features)
                 
             evaluation = {
                 'total_predictions': len(predictions),
-                'anomaly_predictions': sum(predictions),
+                'anomaly_predictions': int(predictions.sum()),
                 'average_confidence': np.mean(confidences),
                 'confidence_std': np.std(confidences)
             }
@@ -6,11 +6,12 @@ Initializes the application environment and databases
 
 import os
 import sys
-import sqlite3
 import hashlib
 import getpass
 from pathlib import Path
 from cryptography.fernet import Fernet
+from utils.config import Config
+from utils.database import DatabaseManager
 
 def create_directory_structure():
     """Create necessary directories"""
@@ -42,82 +43,10 @@ def create_directory_structure():
 
 def create_database():
     """Initialize SQLite database"""
-    db_path = "data/sentinair.db"
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS system_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            event_type TEXT NOT NULL,
-            event_data TEXT,
-            risk_score REAL DEFAULT 0.0,
-            is_anomaly BOOLEAN DEFAULT 0
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS file_access (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            file_path TEXT NOT NULL,
-            access_type TEXT NOT NULL,
-            process_name TEXT,
-            user_name TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS usb_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            device_id TEXT,
-            device_name TEXT,
-            event_type TEXT NOT NULL,
-            vendor_id TEXT,
-            product_id TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS application_launches (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            app_name TEXT NOT NULL,
-            app_path TEXT,
-            process_id INTEGER,
-            command_line TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_behavior (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            activity_type TEXT NOT NULL,
-            duration_seconds INTEGER,
-            keystroke_patterns TEXT,
-            mouse_patterns TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS anomaly_alerts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            alert_type TEXT NOT NULL,
-            severity TEXT NOT NULL,
-            description TEXT,
-            confidence_score REAL,
-            acknowledged BOOLEAN DEFAULT 0
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    # DatabaseManager sets the page size and auto-vacuum mode before creating the
+    # tables, and creates the same schema (epoch-millisecond timestamps) the app uses
+    db_manager = DatabaseManager(Config())
+    db_manager.close_all()
     
     print("✓ Database initialized")
 
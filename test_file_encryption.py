@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for chunked file encryption and the epoch-millisecond timestamp migration
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from utils.config import Config
+from utils.database import DatabaseManager
+from utils.encryption import DataEncryption, FILE_CHUNK_SIZE, FILE_MAGIC, _FRAME_HEADER, _NONCE_SIZE
+
+class TempConfig(Config):
+    """Config that keeps the database and key file inside a scratch directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        super().__init__()
+
+    def get_database_path(self) -> str:
+        return os.path.join(self.directory, 'sentinair.db')
+
+    def get_encryption_key_path(self) -> str:
+        return os.path.join(self.directory, 'encryption.key')
+
+def _split_frames(blob: bytes) -> list:
+    """Split an encrypted file body into its raw length/nonce/ciphertext frames"""
+    frames = []
+    offset = len(FILE_MAGIC)
+    while offset < len(blob):
+        (length,) = _FRAME_HEADER.unpack_from(blob, offset)
+        end = offset + _FRAME_HEADER.size + _NONCE_SIZE + length
+        frames.append(blob[offset:end])
+        offset = end
+    return frames
+
+def _assert_rejected(encryption, directory: str, blob: bytes):
+    """Tampered input must fail and leave neither output nor temp files behind"""
+    encrypted_path = os.path.join(directory, 'tampered.bin.encrypted')
+    output_path = os.path.join(directory, 'tampered.bin')
+    with open(encrypted_path, 'wb') as f:
+        f.write(blob)
+
+    before = set(os.listdir(directory))
+    assert not encryption.decrypt_file(encrypted_path, output_path)
+    assert not os.path.exists(output_path)
+    assert set(os.listdir(directory)) == before
+
+def test_file_round_trips():
+    with tempfile.TemporaryDirectory() as directory:
+        encryption = DataEncryption(TempConfig(directory))
+
+        for size in (0, 1, FILE_CHUNK_SIZE, FILE_CHUNK_SIZE + 1, 3 * FILE_CHUNK_SIZE + 17):
+            data = os.urandom(size)
+            plain_path = os.path.join(directory, f'plain_{size}.bin')
+            encrypted_path = plain_path + '.encrypted'
+            output_path = plain_path + '.out'
+            with open(plain_path, 'wb') as f:
+                f.write(data)
+
+            assert encryption.encrypt_file(plain_path, encrypted_path)
+            assert encryption.decrypt_file(encrypted_path, output_path)
+            with open(output_path, 'rb') as f:
+                assert f.read() == data, f"round trip failed for {size} bytes"
+
+def test_tampered_frames_rejected():
+    with tempfile.TemporaryDirectory() as directory:
+        encryption = DataEncryption(TempConfig(directory))
+
+        plain_path = os.path.join(directory, 'plain.bin')
+        encrypted_path = plain_path + '.encrypted'
+        with open(plain_path, 'wb') as f:
+            f.write(os.urandom(3 * FILE_CHUNK_SIZE))
+        assert encryption.encrypt_file(plain_path, encrypted_path)
+
+        with open(encrypted_path, 'rb') as f:
+            blob = f.read()
+        frames = _split_frames(blob)
+        assert len(frames) == 3
+
+        # Dropping the final frame, cutting one short, or swapping two must all fail
+        _assert_rejected(encryption, directory, FILE_MAGIC + b''.join(frames[:-1]))
+        _assert_rejected(encryption, directory, blob[:-1])
+        _assert_rejected(encryption, directory, FILE_MAGIC + frames[1] + frames[0] + frames[2])
+        _assert_rejected(encryption, directory, FILE_MAGIC)
+
+def test_legacy_fernet_file_decrypts():
+    with tempfile.TemporaryDirectory() as directory:
+        encryption = DataEncryption(TempConfig(directory))
+        data = os.urandom(4096)
+
+        # Older releases wrote the whole file as one Fernet token
+        encrypted_path = os.path.join(directory, 'legacy.bin.encrypted')
+        output_path = os.path.join(directory, 'legacy.bin')
+        with open(encrypted_path, 'wb') as f:
+            f.write(encryption.fernet.encrypt(data))
+
+        assert encryption.decrypt_file(encrypted_path, output_path)
+        with open(output_path, 'rb') as f:
+            assert f.read() == data
+
+def test_baseline_database_migrates_timestamps():
+    with tempfile.TemporaryDirectory() as directory:
+        config = TempConfig(directory)
+
+        # Schema as written by earlier releases: text DATETIME timestamps, user_version 0
+        conn = sqlite3.connect(config.get_database_path())
+        conn.execute('''
+            CREATE TABLE system_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                event_type TEXT NOT NULL,
+                event_data TEXT,
+                risk_score REAL DEFAULT 0.0,
+                is_anomaly BOOLEAN DEFAULT 0,
+                acknowledged BOOLEAN DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute(
+            "INSERT INTO system_events (timestamp, event_type) VALUES (?, ?)",
+            ('2024-01-02 03:04:05', 'legacy'),
+        )
+        conn.commit()
+        conn.close()
+
+        db_manager = DatabaseManager(config)
+        db_manager.close_all()
+
+        conn = sqlite3.connect(config.get_database_path())
+        try:
+            timestamp, kind = conn.execute(
+                "SELECT timestamp, typeof(timestamp) FROM system_events WHERE event_type = 'legacy'"
+            ).fetchone()
+            expected = int(datetime(2024, 1, 2, 3, 4, 5).timestamp() * 1000)
+
+            assert kind == 'integer'
+            assert timestamp == expected
+            assert conn.execute("PRAGMA user_version").fetchone()[0] >= 1
+        finally:
+            conn.close()
+
+def main():
+    print("🧪 Testing file encryption and timestamp migration...")
+
+    for test in (test_file_round_trips, test_tampered_frames_rejected,
+                 test_legacy_fernet_file_decrypts, test_baseline_database_migrates_timestamps):
+        test()
+        print(f"✅ {test.__name__}")
+
+    print("🎉 All tests passed")
+
+if __name__ == "__main__":
+    main()
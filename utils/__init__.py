@@ -2,10 +2,17 @@
 Initialization file for the utils package
 """
 
-from .config import Config
-from .logger import setup_logging, SecurityAuditLogger
-from .database import DatabaseManager
-from .encryption import DataEncryption
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that
+# importing e.g. Config does not pull in cryptography or sqlite3
+_LAZY_ATTRS = {
+    'Config': '.config',
+    'setup_logging': '.logger',
+    'SecurityAuditLogger': '.logger',
+    'DatabaseManager': '.database',
+    'DataEncryption': '.encryption'
+}
 
 __all__ = [
     'Config',
@@ -14,3 +21,15 @@ __all__ = [
     'DatabaseManager', 
     'DataEncryption'
 ]
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
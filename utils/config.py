@@ -3,11 +3,76 @@ Configuration management for Sentinair
 """
 
 import os
+import copy
 import yaml
 import hashlib
 import logging
+import tempfile
 from typing import Dict, Any, Optional
 
+# Prefer the libyaml-backed C loader/dumper when available
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+_MISSING = object()
+
+# Built once at import; load_config overlays the YAML file on a copy of it
+_DEFAULT_CONFIG = {
+    'system': {
+        'platform': 'auto',
+        'stealth_mode': False,
+        'admin_password_hash': ''
+    },
+    'detection': {
+        'track_file_access': True,
+        'track_usb_events': True,
+        'track_app_launches': True,
+        'track_user_behavior': True,
+        'anomaly_threshold': 0.7,
+        'training_interval_hours': 24,
+        'min_training_samples': 1000,
+        'alert_severity_threshold': 'medium',
+        'max_alerts_per_hour': 10
+    },
+    'ml': {
+        'model_type': 'isolation_forest',
+        'contamination_rate': 0.1,
+        'n_estimators': 100,
+        'random_state': 42
+    },
+    'storage': {
+        'max_log_size_mb': 500,
+        'log_retention_days': 30,
+        'auto_cleanup': True
+    },
+    'gui': {
+        'theme': 'dark',
+        'window_size': [1200, 800],
+        'refresh_interval_seconds': 5
+    },
+    'reporting': {
+        'auto_generate_daily': True,
+        'report_formats': ['pdf', 'csv'],
+        'include_graphs': True
+    },
+    'security': {
+        'encrypt_logs': True,
+        'secure_delete': True,
+        'tamper_detection': True
+    }
+}
+
+def _deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively overlay override onto base, modifying base in place"""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
 class Config:
     """Configuration manager for Sentinair"""
     
@@ -16,6 +81,16 @@ class Config:
         self.config_data = {}
         self.logger = logging.getLogger(__name__)
         
+        # SQLite tuning applied to every database connection
+        self.sqlite_pragmas = {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'temp_store': 'MEMORY',
+            'mmap_size': 268435456,  # 256MB
+            'cache_size': -65536,  # 64MB
+            'busy_timeout': 30000  # ms
+        }
+        
         self.load_config()
         
     def load_config(self):
@@ -23,7 +98,9 @@ class Config:
         try:
             if os.path.exists(self.config_path):
                 with open(self.config_path, 'r') as f:
-                    self.config_data = yaml.safe_load(f) or {}
+                    loaded = yaml.load(f, Loader=_YamlLoader) or {}
+                # Fill in any keys missing from the file with their defaults
+                self.config_data = _deep_merge(self._get_default_config(), loaded)
                 self.logger.info(f"Configuration loaded from {self.config_path}")
             else:
                 self.logger.warning(f"Configuration file not found: {self.config_path}")
@@ -33,96 +110,91 @@ class Config:
             self.logger.error(f"Error loading configuration: {e}")
             self.config_data = self._get_default_config()
             
+        self._materialize_settings()
+        
+    def _materialize_settings(self):
+        """Cache frequently read settings as plain attributes"""
+        setting = self._converted_setting
+        self.alert_threshold = setting('detection.anomaly_threshold', 0.7, float)
+        self.training_interval_hours = setting('detection.training_interval_hours', 24, int)
+        self.max_log_size_mb = setting('storage.max_log_size_mb', 500, int)
+        self.log_retention_days = setting('storage.log_retention_days', 30, int)
+        self.refresh_interval_seconds = setting('gui.refresh_interval_seconds', 5, int)
+        self.window_size = setting('gui.window_size', [1200, 800], tuple)
+        
+    def _converted_setting(self, key_path: str, default: Any, convert) -> Any:
+        """Read a setting and convert it, falling back to the default if the value is invalid"""
+        value = self.get(key_path, default)
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            self.logger.warning(f"Invalid value {value!r} for {key_path}, using default {default!r}")
+            return convert(default)
+            
     def _get_default_config(self) -> Dict[str, Any]:
         """Get default configuration"""
-        return {
-            'system': {
-                'platform': 'auto',
-                'stealth_mode': False,
-                'admin_password_hash': ''
-            },
-            'detection': {
-                'track_file_access': True,
-                'track_usb_events': True,
-                'track_app_launches': True,
-                'track_user_behavior': True,
-                'anomaly_threshold': 0.7,
-                'training_interval_hours': 24,
-                'min_training_samples': 1000,
-                'alert_severity_threshold': 'medium',
-                'max_alerts_per_hour': 10
-            },
-            'ml': {
-                'model_type': 'isolation_forest',
-                'contamination_rate': 0.1,
-                'n_estimators': 100,
-                'random_state': 42
-            },
-            'storage': {
-                'max_log_size_mb': 500,
-                'log_retention_days': 30,
-                'auto_cleanup': True
-            },
-            'gui': {
-                'theme': 'dark',
-                'window_size': [1200, 800],
-                'refresh_interval_seconds': 5
-            },
-            'reporting': {
-                'auto_generate_daily': True,
-                'report_formats': ['pdf', 'csv'],
-                'include_graphs': True
-            },
-            'security': {
-                'encrypt_logs': True,
-                'secure_delete': True,
-                'tamper_detection': True
-            }
-        }
+        return copy.deepcopy(_DEFAULT_CONFIG)
         
     def get(self, key_path: str, default: Any = None) -> Any:
         """Get configuration value using dot notation"""
-        try:
-            keys = key_path.split('.')
-            value = self.config_data
-            
-            for key in keys:
-                if isinstance(value, dict) and key in value:
-                    value = value[key]
-                else:
-                    return default
-                    
-            return value
-            
-        except Exception as e:
-            self.logger.debug(f"Error getting config value for {key_path}: {e}")
-            return default
+        value = self.config_data
+        key, sep, tail = key_path.partition('.')
+        
+        # The isinstance/get walk cannot raise, so no try/except on this hot path;
+        # an empty component ('', 'a..b', 'a.') is treated as a missing key
+        while True:
+            if not key or not isinstance(value, dict):
+                return default
+            value = value.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            if not sep:
+                return value
+            key, sep, tail = tail.partition('.')
             
     def set(self, key_path: str, value: Any):
         """Set configuration value using dot notation"""
         try:
-            keys = key_path.split('.')
             config = self.config_data
+            key, sep, tail = key_path.partition('.')
             
             # Navigate to the parent of the target key
-            for key in keys[:-1]:
+            while sep:
                 if key not in config:
                     config[key] = {}
                 config = config[key]
+                key, sep, tail = tail.partition('.')
                 
             # Set the value
-            config[keys[-1]] = value
+            config[key] = value
             
-        except Exception as e:
-            self.logger.error(f"Error setting config value for {key_path}: {e}")
+            # Keep cached attributes in sync
+            self._materialize_settings()
+            
+        except TypeError as e:
+            # Raised only when an intermediate path component is not a mapping
+            self.logger.error("Error setting config value for %s: %s", key_path, e)
             
     def save_config(self):
         """Save configuration to file"""
         try:
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
+            directory = os.path.dirname(os.path.abspath(self.config_path))
+            os.makedirs(directory, exist_ok=True)
             
-            with open(self.config_path, 'w') as f:
-                yaml.dump(self.config_data, f, default_flow_style=False, indent=2)
+            # Write to a unique temporary file and swap it in so a crash never leaves a torn
+            # config; mkstemp creates it 0600, and an existing file's mode is carried over
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f".{os.path.basename(self.config_path)}.", suffix='.tmp', dir=directory
+            )
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    yaml.dump(self.config_data, f, Dumper=_YamlDumper, default_flow_style=False, indent=2)
+                if os.path.exists(self.config_path):
+                    os.chmod(tmp_path, os.stat(self.config_path).st_mode & 0o7777)
+                os.replace(tmp_path, self.config_path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
                 
             self.logger.info(f"Configuration saved to {self.config_path}")
             
@@ -148,6 +220,12 @@ class Config:
         """Get database file path"""
         return os.path.join('data', 'sentinair.db')
         
+    def get_sqlite_pragmas(self) -> Dict[str, Any]:
+        """Get SQLite PRAGMA settings, with overrides from storage.sqlite_pragmas"""
+        pragmas = dict(self.sqlite_pragmas)
+        pragmas.update(self.get('storage.sqlite_pragmas') or {})
+        return pragmas
+        
     def get_encryption_key_path(self) -> str:
         """Get encryption key file path"""
         return os.path.join('config', 'encryption.key')
@@ -180,19 +258,19 @@ class Config:
             
     def get_alert_threshold(self) -> float:
         """Get anomaly detection threshold"""
-        return self.get('detection.anomaly_threshold', 0.7)
+        return self.alert_threshold
         
     def get_training_interval(self) -> int:
         """Get model training interval in hours"""
-        return self.get('detection.training_interval_hours', 24)
+        return self.training_interval_hours
         
     def get_max_log_size(self) -> int:
         """Get maximum log size in MB"""
-        return self.get('storage.max_log_size_mb', 500)
+        return self.max_log_size_mb
         
     def get_log_retention_days(self) -> int:
         """Get log retention period in days"""
-        return self.get('storage.log_retention_days', 30)
+        return self.log_retention_days
         
     def get_gui_theme(self) -> str:
         """Get GUI theme"""
@@ -200,9 +278,8 @@ class Config:
         
     def get_window_size(self) -> tuple:
         """Get default window size"""
-        size = self.get('gui.window_size', [1200, 800])
-        return tuple(size)
+        return self.window_size
         
     def get_refresh_interval(self) -> int:
         """Get GUI refresh interval in seconds"""
-        return self.get('gui.refresh_interval_seconds', 5)
+        return self.refresh_interval_seconds
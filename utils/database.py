@@ -3,39 +3,244 @@ Database management for Sentinair
 Handles SQLite database operations for event storage and retrieval
 """
 
+import os
 import sqlite3
-import json
+import atexit
 import logging
+import weakref
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+from .json_utils import safe_json_loads
 from contextlib import contextmanager
+from collections import deque
 import threading
 
+# Event times are stored as integer Unix epoch milliseconds
+_SCHEMA_VERSION = 1
+_EVENT_TIME_TABLES = (
+    'system_events',
+    'file_access',
+    'usb_events',
+    'application_launches',
+    'user_behavior',
+    'anomaly_alerts'
+)
+
+# Page layout settings that only take effect before the first table is created
+_NEW_DATABASE_PRAGMAS = (
+    ('page_size', 8192),
+    ('auto_vacuum', 'INCREMENTAL')
+)
+
+# Busy/locked flushes are retried this many times in a row before the rows are dropped
+_MAX_FLUSH_RETRIES = 20
+
+def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+    """True for transient SQLITE_BUSY / SQLITE_LOCKED errors"""
+    code = getattr(error, 'sqlite_errorcode', None)  # Python 3.11+
+    if code is not None:
+        return code & 0xff in (5, 6)  # SQLITE_BUSY, SQLITE_LOCKED
+    return 'locked' in str(error) or 'busy' in str(error)
+
+def _queued_table(sql: str) -> str:
+    """Table name targeted by one of the queued INSERT statements"""
+    return sql.split()[2]
+
+def _to_epoch_ms(value: Any) -> Optional[int]:
+    """Convert a datetime, ISO-8601 string or epoch number to epoch milliseconds"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+def _from_epoch_ms(value: Any) -> Any:
+    """Convert stored epoch milliseconds back to a local ISO-8601 string"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000).isoformat()
+    return value
+
+# Current time as epoch milliseconds, used for timestamp defaults
+_NOW_EPOCH_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# INSERT statements shared by the single-row and batched write paths. A NULL
+# timestamp is filled in by SQLite, saving a datetime.now() per row in Python
+_INSERT_SYSTEM_EVENT_SQL = f'''
+    INSERT INTO system_events 
+    (timestamp, event_type, event_data, risk_score, is_anomaly)
+    VALUES (COALESCE(?, {_NOW_EPOCH_MS_SQL}), ?, ?, ?, ?)
+'''
+
+_INSERT_FILE_ACCESS_SQL = f'''
+    INSERT INTO file_access 
+    (timestamp, file_path, access_type, file_size, file_extension, 
+     process_name, process_pid, user_name, is_suspicious)
+    VALUES (COALESCE(?, {_NOW_EPOCH_MS_SQL}), ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_USB_EVENT_SQL = f'''
+    INSERT INTO usb_events 
+    (timestamp, event_type, device_path, device_name, vendor_id, 
+     product_id, mount_point, file_system, total_bytes, is_suspicious)
+    VALUES (COALESCE(?, {_NOW_EPOCH_MS_SQL}), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_ALERT_SQL = f'''
+    INSERT INTO anomaly_alerts 
+    (timestamp, alert_type, severity, confidence_score, 
+     event_id, description)
+    VALUES (COALESCE(?, {_NOW_EPOCH_MS_SQL}), ?, ?, ?, ?, ?)
+'''
+
+def _system_event_row(event_data: Dict[str, Any]) -> tuple:
+    """Build the parameter tuple for a system_events insert"""
+    return (
+        _to_epoch_ms(event_data.get('timestamp')),
+        event_data['event_type'],
+        event_data.get('event_data', ''),
+        event_data.get('risk_score', 0.0),
+        event_data.get('is_anomaly', False)
+    )
+
+def _file_access_row(file_data: Dict[str, Any]) -> tuple:
+    """Build the parameter tuple for a file_access insert"""
+    return (
+        _to_epoch_ms(file_data.get('timestamp')),
+        file_data['file_path'],
+        file_data['access_type'],
+        file_data.get('file_size', 0),
+        file_data.get('file_extension', ''),
+        file_data.get('process_name', ''),
+        file_data.get('process_pid', 0),
+        file_data.get('user_name', ''),
+        file_data.get('is_suspicious', False)
+    )
+
+def _usb_event_row(usb_data: Dict[str, Any]) -> tuple:
+    """Build the parameter tuple for a usb_events insert"""
+    return (
+        _to_epoch_ms(usb_data.get('timestamp')),
+        usb_data['event_type'],
+        usb_data.get('device_path', ''),
+        usb_data.get('device_name', ''),
+        usb_data.get('vendor_id', ''),
+        usb_data.get('product_id', ''),
+        usb_data.get('mount_point', ''),
+        usb_data.get('file_system', ''),
+        usb_data.get('total_bytes', 0),
+        usb_data.get('is_suspicious', False)
+    )
+
+def _alert_row(alert_data: Dict[str, Any]) -> tuple:
+    """Build the parameter tuple for an anomaly_alerts insert"""
+    return (
+        _to_epoch_ms(alert_data.get('timestamp')),
+        alert_data['alert_type'],
+        alert_data['severity'],
+        alert_data['confidence_score'],
+        alert_data.get('event_id'),
+        alert_data.get('description', '')
+    )
+
+# Managers still alive at exit get their queues flushed and connections closed
+_live_managers = weakref.WeakSet()
+
+def _close_live_managers():
+    """Close every DatabaseManager that has not been garbage collected"""
+    for manager in list(_live_managers):
+        manager.close_all()
+
+atexit.register(_close_live_managers)
+
 class DatabaseManager:
     """Database manager for Sentinair events and data"""
     
+    # journal_mode is stored in the database file, so it only needs to be set
+    # once per path per process rather than on every connection
+    _journal_mode_applied = set()
+    _journal_mode_lock = threading.Lock()
+    
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.db_path = config.get_database_path()
-        self.lock = threading.RLock()  # Reentrant lock for thread safety
+        
+        pragmas = config.get_sqlite_pragmas()
+        self.journal_mode = pragmas.pop('journal_mode', None)
+        self.sqlite_pragmas = pragmas
+        self.lock = threading.RLock()  # Serializes batch flushes so they commit in order
+        
+        # One long-lived connection per thread, closed when the thread has exited or on close_all
+        self._tls = threading.local()
+        self._connections = weakref.WeakKeyDictionary()
+        self._connections_lock = threading.Lock()
+        _live_managers.add(self)
+        
+        # Write-behind queues drained by a background flusher thread
+        storage_config = config.get('storage', {})
+        self.batch_size = storage_config.get('event_batch_size', 256)
+        self.flush_interval = storage_config.get('event_flush_interval_ms', 250) / 1000.0
+        self.max_queued_rows = storage_config.get('event_queue_max_rows', 10000)
+        self._write_queues = {
+            sql: deque(maxlen=self.max_queued_rows)
+            for sql in (_INSERT_SYSTEM_EVENT_SQL, _INSERT_FILE_ACCESS_SQL, _INSERT_USB_EVENT_SQL, _INSERT_ALERT_SQL)
+        }
+        self._dropped_rows = {}  # rows pushed out of a full queue, reported on the next flush
+        self._flush_failures = {}  # consecutive busy/locked flush failures per queue
+        self._queue_lock = threading.Lock()
+        self._flush_wakeup = threading.Event()
+        self._flush_stop = None
+        self._flush_thread = None
         
         # Initialize database
+        self._prepare_new_database()
         self._initialize_database()
         
+    def _prepare_new_database(self):
+        """Set page size and incremental auto-vacuum on a newly created database file"""
+        if os.path.exists(self.db_path) and os.path.getsize(self.db_path) > 0:
+            return
+            
+        # Must run before WAL is enabled; VACUUM writes the header so the settings persist
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for name, value in _NEW_DATABASE_PRAGMAS:
+                conn.execute(f"PRAGMA {name}={value}")
+            conn.execute("VACUUM")
+        except Exception as e:
+            self.logger.warning(f"Could not apply new database page settings: {e}")
+        finally:
+            conn.close()
+            
     def _initialize_database(self):
         """Initialize database with required tables"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
+                # Only databases that already had tables can hold legacy data
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'system_events'")
+                existing = cursor.fetchone() is not None
+                
                 # Create tables if they don't exist
                 self._create_tables(cursor)
                 
+                # Bring databases created by older versions up to date
+                self._migrate_schema(cursor, existing)
+                
                 # Create indexes for better performance
                 self._create_indexes(cursor)
                 
                 conn.commit()
+                
+                # Gather planner statistics once so the composite indexes get picked
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    cursor.execute("ANALYZE")
+                    conn.commit()
+                    
                 self.logger.info("Database initialized successfully")
                 
         except Exception as e:
@@ -46,10 +251,10 @@ class DatabaseManager:
         """Create database tables"""
         
         # System events table
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS system_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                timestamp INTEGER NOT NULL DEFAULT ({_NOW_EPOCH_MS_SQL}),
                 event_type TEXT NOT NULL,
                 event_data TEXT,
                 risk_score REAL DEFAULT 0.0,
@@ -60,10 +265,10 @@ class DatabaseManager:
         ''')
         
         # File access events
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS file_access (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                timestamp INTEGER NOT NULL DEFAULT ({_NOW_EPOCH_MS_SQL}),
                 file_path TEXT NOT NULL,
                 access_type TEXT NOT NULL,
                 file_size INTEGER DEFAULT 0,
@@ -76,10 +281,10 @@ class DatabaseManager:
         ''')
         
         # USB events
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS usb_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                timestamp INTEGER NOT NULL DEFAULT ({_NOW_EPOCH_MS_SQL}),
                 event_type TEXT NOT NULL,
                 device_path TEXT,
                 device_name TEXT,
@@ -93,10 +298,10 @@ class DatabaseManager:
         ''')
         
         # Application launches
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS application_launches (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                timestamp INTEGER NOT NULL DEFAULT ({_NOW_EPOCH_MS_SQL}),
                 app_name TEXT NOT NULL,
                 app_path TEXT,
                 process_id INTEGER,
@@ -109,10 +314,10 @@ class DatabaseManager:
         ''')
         
         # User behavior events
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS user_behavior (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                timestamp INTEGER NOT NULL DEFAULT ({_NOW_EPOCH_MS_SQL}),
                 behavior_type TEXT NOT NULL,
                 duration_seconds INTEGER DEFAULT 0,
                 keystroke_count INTEGER DEFAULT 0,
@@ -123,10 +328,10 @@ class DatabaseManager:
         ''')
         
         # Anomaly alerts
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS anomaly_alerts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                timestamp INTEGER NOT NULL DEFAULT ({_NOW_EPOCH_MS_SQL}),
                 alert_type TEXT NOT NULL,
                 severity TEXT NOT NULL,
                 confidence_score REAL NOT NULL,
@@ -149,19 +354,40 @@ class DatabaseManager:
             )
         ''')
         
+    def _migrate_schema(self, cursor, existing: bool):
+        """Apply one-time data migrations tracked by PRAGMA user_version"""
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        
+        # Freshly created tables already use the current schema
+        if existing and version < 1:
+            # Text DATETIME values were written from naive local time
+            for table in _EVENT_TIME_TABLES:
+                cursor.execute(f'''
+                    UPDATE {table}
+                    SET timestamp = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+                    WHERE typeof(timestamp) = 'text' AND julianday(timestamp) IS NOT NULL
+                ''')
+            self.logger.info("Converted event timestamps to epoch milliseconds")
+            
+        if version < _SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            
     def _create_indexes(self, cursor):
         """Create database indexes for better performance"""
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_system_events_timestamp ON system_events(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_system_events_type ON system_events(event_type)",
-            "CREATE INDEX IF NOT EXISTS idx_system_events_anomaly ON system_events(is_anomaly)",
+            "CREATE INDEX IF NOT EXISTS idx_system_events_anom_ts ON system_events(is_anomaly, timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_file_access_timestamp ON file_access(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_file_access_path ON file_access(file_path)",
             "CREATE INDEX IF NOT EXISTS idx_usb_events_timestamp ON usb_events(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_app_launches_timestamp ON application_launches(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_user_behavior_timestamp ON user_behavior(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_anomaly_alerts_timestamp ON anomaly_alerts(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_anomaly_alerts_severity ON anomaly_alerts(severity)"
+            "CREATE INDEX IF NOT EXISTS idx_alerts_sev_ts ON anomaly_alerts(severity, timestamp)",
+            # Superseded by the composite indexes above
+            "DROP INDEX IF EXISTS idx_system_events_anomaly",
+            "DROP INDEX IF EXISTS idx_anomaly_alerts_severity"
         ]
         
         for index_sql in indexes:
@@ -172,80 +398,271 @@ class DatabaseManager:
                 
     @contextmanager
     def get_connection(self):
-        """Get database connection with proper error handling"""
+        """Get the calling thread's database connection with proper error handling
+        
+        No lock is taken here: each thread owns its connection and WAL mode lets
+        readers proceed while another connection writes
+        """
         conn = None
         try:
-            with self.lock:
-                conn = sqlite3.connect(
-                    self.db_path,
-                    timeout=30.0,
-                    check_same_thread=False
-                )
-                conn.row_factory = sqlite3.Row  # Enable column access by name
-                yield conn
+            conn = self._get_thread_connection()
+            yield conn
         except Exception as e:
             if conn:
                 conn.rollback()
             self.logger.error(f"Database error: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
+            
+    def _get_thread_connection(self) -> sqlite3.Connection:
+        """Return the cached connection for the calling thread, opening it on first use"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=30.0,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row  # Enable column access by name
+            self._apply_pragmas(conn)
+            
+            self._tls.conn = conn
+            with self._connections_lock:
+                self._close_dead_thread_connections()
+                self._connections[threading.current_thread()] = conn
                 
+        return conn
+        
+    def _close_dead_thread_connections(self):
+        """Close connections owned by threads that have finished; the caller holds _connections_lock"""
+        for thread, conn in list(self._connections.items()):
+            if not thread.is_alive():
+                del self._connections[thread]
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    self.logger.debug(f"Error closing connection: {e}")
+                    
+    def close_thread_connection(self):
+        """Close the calling thread's cached connection, if it has one"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            return
+            
+        self._tls.conn = None
+        with self._connections_lock:
+            self._connections.pop(threading.current_thread(), None)
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            self.logger.debug(f"Error closing connection: {e}")
+            
+    def close_all(self):
+        """Flush queued writes and close every cached connection"""
+        self._stop_flusher()
+        self.flush()
+        
+        with self._connections_lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    self.logger.debug(f"Error closing connection: {e}")
+            self._connections.clear()
+            
+            # Drop the per-thread references so new connections are opened on next use
+            self._tls = threading.local()
+                
+    def _apply_pragmas(self, conn):
+        """Apply persistent and per-connection SQLite PRAGMAs"""
+        if self.journal_mode and self.db_path not in self._journal_mode_applied:
+            with self._journal_mode_lock:
+                if self.db_path not in self._journal_mode_applied:
+                    conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+                    self._journal_mode_applied.add(self.db_path)
+                    
+        for name, value in self.sqlite_pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+            
     def insert_event(self, event_data: Dict[str, Any]) -> int:
         """Insert a system event into the database"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO system_events 
-                    (timestamp, event_type, event_data, risk_score, is_anomaly)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    event_data.get('timestamp', datetime.now()),
-                    event_data['event_type'],
-                    event_data.get('event_data', ''),
-                    event_data.get('risk_score', 0.0),
-                    event_data.get('is_anomaly', False)
-                ))
-                
-                event_id = cursor.lastrowid
-                conn.commit()
-                
-                return event_id
+                # The connection context manager commits on success and rolls back on error
+                with conn:
+                    cursor = conn.execute(_INSERT_SYSTEM_EVENT_SQL, _system_event_row(event_data))
+                    
+                return cursor.lastrowid
                 
         except Exception as e:
             self.logger.error(f"Error inserting event: {e}")
             return -1
             
-    def insert_file_access(self, file_data: Dict[str, Any]) -> int:
-        """Insert file access event"""
+    def insert_events(self, events: List[Dict[str, Any]]) -> int:
+        """Insert a batch of system events in a single transaction"""
+        if not events:
+            return 0
+            
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
+                with conn:
+                    conn.executemany(_INSERT_SYSTEM_EVENT_SQL, [_system_event_row(e) for e in events])
+                    
+                return len(events)
                 
-                cursor.execute('''
-                    INSERT INTO file_access 
-                    (timestamp, file_path, access_type, file_size, file_extension, 
-                     process_name, process_pid, user_name, is_suspicious)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    file_data.get('timestamp', datetime.now()),
-                    file_data['file_path'],
-                    file_data['access_type'],
-                    file_data.get('file_size', 0),
-                    file_data.get('file_extension', ''),
-                    file_data.get('process_name', ''),
-                    file_data.get('process_pid', 0),
-                    file_data.get('user_name', ''),
-                    file_data.get('is_suspicious', False)
-                ))
-                
-                file_id = cursor.lastrowid
-                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error inserting {len(events)} events: {e}")
+            return 0
+            
+    def queue_event(self, event_data: Dict[str, Any]):
+        """Queue a system event for the next batched write"""
+        self._enqueue(_INSERT_SYSTEM_EVENT_SQL, _system_event_row(event_data))
+        
+    def queue_file_access(self, file_data: Dict[str, Any]):
+        """Queue a file access event for the next batched write"""
+        self._enqueue(_INSERT_FILE_ACCESS_SQL, _file_access_row(file_data))
+        
+    def queue_usb_event(self, usb_data: Dict[str, Any]):
+        """Queue a USB event for the next batched write"""
+        self._enqueue(_INSERT_USB_EVENT_SQL, _usb_event_row(usb_data))
+        
+    def queue_alert(self, alert_data: Dict[str, Any]):
+        """Queue an anomaly alert for the next batched write"""
+        self._enqueue(_INSERT_ALERT_SQL, _alert_row(alert_data))
+        
+    def _enqueue(self, sql: str, row: tuple):
+        """Append a row to its write queue, waking the flusher when a batch is full"""
+        with self._queue_lock:
+            queue = self._write_queues[sql]
+            if len(queue) == queue.maxlen:
+                self._dropped_rows[sql] = self._dropped_rows.get(sql, 0) + 1
+            queue.append(row)
+            batch_full = len(queue) >= self.batch_size
+            
+            if self._flush_thread is None:
+                self._flush_stop = threading.Event()
+                self._flush_thread = threading.Thread(
+                    target=self._flush_loop,
+                    args=(self._flush_stop,),
+                    daemon=True
+                )
+                self._flush_thread.start()
                 
-                return file_id
+        if batch_full:
+            self._flush_wakeup.set()
+            
+    def _flush_loop(self, stop_event: threading.Event):
+        """Background loop writing queued rows every flush interval"""
+        while not stop_event.is_set():
+            self._flush_wakeup.wait(self.flush_interval)
+            self._flush_wakeup.clear()
+            self.flush()
+            
+    def _stop_flusher(self):
+        """Stop the background flusher thread if it is running"""
+        with self._queue_lock:
+            flush_thread, stop_event = self._flush_thread, self._flush_stop
+            self._flush_thread = None
+            
+        if flush_thread is not None:
+            stop_event.set()
+            self._flush_wakeup.set()
+            flush_thread.join(timeout=5)
+            
+    def flush(self) -> int:
+        """Write all queued rows, one transaction per table, and return how many were written"""
+        with self.lock:
+            with self._queue_lock:
+                batches = [(sql, list(queue)) for sql, queue in self._write_queues.items() if queue]
+                for queue in self._write_queues.values():
+                    queue.clear()
+                dropped, self._dropped_rows = self._dropped_rows, {}
+                
+            for sql, count in dropped.items():
+                self.logger.error(f"Write queue for {_queued_table(sql)} was full, dropped {count} oldest rows")
+                
+            # Separate transactions so a failing table does not hold back the others
+            return sum(self._flush_table(sql, rows) for sql, rows in batches)
+            
+    def _flush_table(self, sql: str, rows: List[tuple]) -> int:
+        """Write one table's queued rows in a single transaction"""
+        try:
+            with self.get_connection() as conn, conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(sql, rows)
+                
+            self._flush_failures.pop(sql, None)
+            return len(rows)
+            
+        except sqlite3.IntegrityError as e:
+            # One bad row fails the whole transaction; write the rest individually
+            self.logger.warning(
+                f"Queued batch of {len(rows)} {_queued_table(sql)} rows rejected ({e}), retrying row by row"
+            )
+            return self._flush_rows_individually(sql, rows)
+            
+        except sqlite3.OperationalError as e:
+            self._handle_flush_error(sql, rows, e)
+            return 0
+            
+        except Exception as e:
+            self.logger.error(f"Dropping {len(rows)} queued {_queued_table(sql)} rows: {e}")
+            return 0
+            
+    def _flush_rows_individually(self, sql: str, rows: List[tuple]) -> int:
+        """Write queued rows one transaction each, dropping only rows that violate a constraint"""
+        written = 0
+        position = 0
+        try:
+            with self.get_connection() as conn:
+                for position, row in enumerate(rows):
+                    try:
+                        with conn:
+                            conn.execute(sql, row)
+                        written += 1
+                    except sqlite3.IntegrityError as e:
+                        self.logger.error(f"Dropping queued row that violates a constraint: {e}")
+                        
+            self._flush_failures.pop(sql, None)
+            
+        except sqlite3.OperationalError as e:
+            self._handle_flush_error(sql, rows[position:], e)
+            
+        return written
+        
+    def _handle_flush_error(self, sql: str, rows: List[tuple], error: sqlite3.OperationalError):
+        """Requeue rows after a busy/locked error, up to a retry limit; drop them otherwise"""
+        table = _queued_table(sql)
+        
+        if _is_busy_error(error):
+            failures = self._flush_failures.get(sql, 0) + 1
+            if failures <= _MAX_FLUSH_RETRIES:
+                self._flush_failures[sql] = failures
+                self.logger.warning(f"Database busy ({error}), will retry {len(rows)} queued {table} rows")
+                self._requeue(sql, rows)
+                return
+                
+        # Schema mismatch, read-only database, disk full...: retrying would not help
+        self._flush_failures.pop(sql, None)
+        self.logger.error(f"Dropping {len(rows)} queued {table} rows: {error}")
+        
+    def _requeue(self, sql: str, rows: List[tuple]):
+        """Put unwritten rows back at the front of their queue, preserving order"""
+        with self._queue_lock:
+            queue = self._write_queues[sql]
+            overflow = len(queue) + len(rows) - queue.maxlen
+            if overflow > 0:
+                # extendleft on a full deque discards from the newest end
+                self._dropped_rows[sql] = self._dropped_rows.get(sql, 0) + overflow
+            queue.extendleft(reversed(rows))
+            
+    def insert_file_access(self, file_data: Dict[str, Any]) -> int:
+        """Insert file access event"""
+        try:
+            with self.get_connection() as conn:
+                with conn:
+                    cursor = conn.execute(_INSERT_FILE_ACCESS_SQL, _file_access_row(file_data))
+                    
+                return cursor.lastrowid
                 
         except Exception as e:
             self.logger.error(f"Error inserting file access: {e}")
@@ -255,30 +672,10 @@ class DatabaseManager:
         """Insert USB event"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO usb_events 
-                    (timestamp, event_type, device_path, device_name, vendor_id, 
-                     product_id, mount_point, file_system, total_bytes, is_suspicious)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    usb_data.get('timestamp', datetime.now()),
-                    usb_data['event_type'],
-                    usb_data.get('device_path', ''),
-                    usb_data.get('device_name', ''),
-                    usb_data.get('vendor_id', ''),
-                    usb_data.get('product_id', ''),
-                    usb_data.get('mount_point', ''),
-                    usb_data.get('file_system', ''),
-                    usb_data.get('total_bytes', 0),
-                    usb_data.get('is_suspicious', False)
-                ))
-                
-                usb_id = cursor.lastrowid
-                conn.commit()
-                
-                return usb_id
+                with conn:
+                    cursor = conn.execute(_INSERT_USB_EVENT_SQL, _usb_event_row(usb_data))
+                    
+                return cursor.lastrowid
                 
         except Exception as e:
             self.logger.error(f"Error inserting USB event: {e}")
@@ -288,26 +685,10 @@ class DatabaseManager:
         """Insert anomaly alert"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO anomaly_alerts 
-                    (timestamp, alert_type, severity, confidence_score, 
-                     event_id, description)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    alert_data.get('timestamp', datetime.now()),
-                    alert_data['alert_type'],
-                    alert_data['severity'],
-                    alert_data['confidence_score'],
-                    alert_data.get('event_id'),
-                    alert_data.get('description', '')
-                ))
-                
-                alert_id = cursor.lastrowid
-                conn.commit()
-                
-                return alert_id
+                with conn:
+                    cursor = conn.execute(_INSERT_ALERT_SQL, _alert_row(alert_data))
+                    
+                return cursor.lastrowid
                 
         except Exception as e:
             self.logger.error(f"Error inserting alert: {e}")
@@ -318,36 +699,39 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = None  # Plain tuples are cheaper to build than sqlite3.Row
                 
                 since_date = datetime.now() - timedelta(days=days)
                 
+                # Empty payloads are filtered out here rather than row by row in Python
                 cursor.execute('''
                     SELECT timestamp, event_type, event_data, risk_score, is_anomaly
                     FROM system_events 
-                    WHERE timestamp >= ? AND event_data IS NOT NULL AND event_data != ''
+                    WHERE timestamp >= ? AND event_data IS NOT NULL AND length(event_data) > 0
                     ORDER BY timestamp DESC
                     LIMIT ?
-                ''', (since_date, limit))
-                
-                events = []
-                for row in cursor.fetchall():
-                    try:
-                        event = dict(row)
-                        # Parse JSON event_data if it's a string
-                        if isinstance(event['event_data'], str) and event['event_data'].strip():
-                            event['event_data'] = json.loads(event['event_data'])
-                        elif not event['event_data']:
-                            # Skip events with empty event_data
-                            continue
-                        events.append(event)
-                    except json.JSONDecodeError as je:
-                        self.logger.warning(f"Skipping event with invalid JSON: {je}")
-                        continue
-                    except Exception as ee:
-                        self.logger.warning(f"Skipping problematic event: {ee}")
-                        continue
-                
-                return events
+                ''', (_to_epoch_ms(since_date), limit))
+                
+                rows = cursor.fetchall()
+                
+            loads = safe_json_loads
+            events = []
+            for timestamp, event_type, event_data, risk_score, is_anomaly in rows:
+                try:
+                    parsed_data = loads(event_data)
+                except (ValueError, TypeError) as je:
+                    self.logger.warning(f"Skipping event with invalid JSON: {je}")
+                    continue
+                    
+                events.append({
+                    'timestamp': _from_epoch_ms(timestamp),
+                    'event_type': event_type,
+                    'event_data': parsed_data,
+                    'risk_score': risk_score,
+                    'is_anomaly': is_anomaly
+                })
+                
+            return events
                 
         except Exception as e:
             self.logger.error(f"Error getting recent events: {e}")
@@ -365,9 +749,13 @@ class DatabaseManager:
                     SELECT * FROM anomaly_alerts 
                     WHERE timestamp >= ?
                     ORDER BY timestamp DESC
-                ''', (since_time,))
+                ''', (_to_epoch_ms(since_time),))
                 
-                return [dict(row) for row in cursor.fetchall()]
+                alerts = [dict(row) for row in cursor.fetchall()]
+                for alert in alerts:
+                    alert['timestamp'] = _from_epoch_ms(alert['timestamp'])
+                    
+                return alerts
                 
         except Exception as e:
             self.logger.error(f"Error getting recent alerts: {e}")
@@ -376,17 +764,12 @@ class DatabaseManager:
     def acknowledge_alert(self, alert_id: int, acknowledged_by: str = "system") -> bool:
         """Acknowledge an alert"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
+            with self.get_connection() as conn, conn:
+                return conn.execute('''
                     UPDATE anomaly_alerts 
                     SET acknowledged = 1, acknowledged_at = ?, acknowledged_by = ?
                     WHERE id = ?
-                ''', (datetime.now(), acknowledged_by, alert_id))
-                
-                conn.commit()
-                return cursor.rowcount > 0
+                ''', (datetime.now(), acknowledged_by, alert_id)).rowcount > 0
                 
         except Exception as e:
             self.logger.error(f"Error acknowledging alert: {e}")
@@ -395,17 +778,12 @@ class DatabaseManager:
     def mark_false_positive(self, alert_id: int) -> bool:
         """Mark alert as false positive"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
+            with self.get_connection() as conn, conn:
+                return conn.execute('''
                     UPDATE anomaly_alerts 
                     SET false_positive = 1, acknowledged = 1, acknowledged_at = ?
                     WHERE id = ?
-                ''', (datetime.now(), alert_id))
-                
-                conn.commit()
-                return cursor.rowcount > 0
+                ''', (datetime.now(), alert_id)).rowcount > 0
                 
         except Exception as e:
             self.logger.error(f"Error marking false positive: {e}")
@@ -417,23 +795,20 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
+                cursor.row_factory = None
+                
                 stats = {}
                 
-                # Count events by type
+                # Count events by type and recent anomalies in a single scan
                 cursor.execute('''
-                    SELECT event_type, COUNT(*) as count 
+                    SELECT event_type, COUNT(*) as count,
+                           SUM(CASE WHEN is_anomaly = 1 AND timestamp >= ? THEN 1 ELSE 0 END) as anomalies
                     FROM system_events 
                     GROUP BY event_type
-                ''')
-                stats['events_by_type'] = dict(cursor.fetchall())
-                
-                # Count recent anomalies
-                cursor.execute('''
-                    SELECT COUNT(*) as count 
-                    FROM system_events 
-                    WHERE is_anomaly = 1 AND timestamp >= ?
-                ''', (datetime.now() - timedelta(days=1),))
-                stats['recent_anomalies'] = cursor.fetchone()[0]
+                ''', (_to_epoch_ms(datetime.now() - timedelta(days=1)),))
+                rows = cursor.fetchall()
+                stats['events_by_type'] = {event_type: count for event_type, count, _ in rows}
+                stats['recent_anomalies'] = sum(anomalies for _, _, anomalies in rows)
                 
                 # Count alerts by severity
                 cursor.execute('''
@@ -441,7 +816,7 @@ class DatabaseManager:
                     FROM anomaly_alerts 
                     WHERE timestamp >= ?
                     GROUP BY severity
-                ''', (datetime.now() - timedelta(days=7),))
+                ''', (_to_epoch_ms(datetime.now() - timedelta(days=7)),))
                 stats['alerts_by_severity'] = dict(cursor.fetchall())
                 
                 return stats
@@ -456,7 +831,10 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                cutoff_date = datetime.now() - timedelta(days=retention_days)
+                cutoff_date = _to_epoch_ms(datetime.now() - timedelta(days=retention_days))
+                
+                # Take the write lock up front so both purges land in one transaction
+                cursor.execute("BEGIN IMMEDIATE")
                 
                 # Clean up old events
                 cursor.execute('''
@@ -476,6 +854,12 @@ class DatabaseManager:
                 
                 conn.commit()
                 
+                # Refresh planner statistics and return freed pages to the filesystem
+                cursor.execute("PRAGMA optimize")
+                if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:  # INCREMENTAL
+                    cursor.execute("PRAGMA incremental_vacuum")
+                    cursor.fetchall()
+                
                 self.logger.info(f"Cleaned up {deleted_events} events and {deleted_files} file records")
                 return True
                 
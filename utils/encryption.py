@@ -4,13 +4,64 @@ Handles encryption/decryption of sensitive data
 """
 
 import os
+import hmac
+import struct
+import hashlib
 import logging
+import tempfile
+import threading
+from collections import OrderedDict
 from typing import Union, Optional
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import base64
 
+# Streaming file encryption format:
+#   magic || frames, each frame = ciphertext length (4 bytes) || nonce (12 bytes) || ciphertext+tag
+# Every frame is authenticated with AAD = magic || chunk index || final flag, so
+# reordered, dropped or truncated chunks fail to decrypt
+FILE_MAGIC = b'SNTRAES1'
+FILE_CHUNK_SIZE = 1024 * 1024  # 1MB
+_NONCE_SIZE = 12
+_FRAME_HEADER = struct.Struct('>I')
+_CHUNK_AAD = struct.Struct('>Q?')
+
+# Version byte 0x80 followed by a 64-bit timestamp encodes to this prefix
+_FERNET_TOKEN_PREFIX = 'gAAAAA'
+
+SECURE_DELETE_PASSES = 3
+SECURE_DELETE_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+PASSWORD_KDF_ITERATIONS = 100000
+_DERIVED_KEY_CACHE_SIZE = 256
+_derived_key_cache = OrderedDict()
+_derived_key_cache_lock = threading.Lock()
+# Per-process secret keying the cache index, so cached entries cannot be used to test password guesses offline
+_CACHE_KEY_SECRET = os.urandom(32)
+
+def _derive_password_key(password: bytes, salt: bytes) -> bytes:
+    """PBKDF2-HMAC-SHA256 key derivation, memoized per (password, salt)"""
+    # Index the cache by a keyed digest so plaintext passwords are never retained;
+    # the salt is length-prefixed so (salt, password) splits cannot collide
+    cache_key = hmac.new(_CACHE_KEY_SECRET, len(salt).to_bytes(4, 'big') + salt + password, 'sha256').digest()
+    
+    with _derived_key_cache_lock:
+        derived = _derived_key_cache.get(cache_key)
+        if derived is not None:
+            _derived_key_cache.move_to_end(cache_key)
+            return derived
+            
+    derived = hashlib.pbkdf2_hmac('sha256', password, salt, PASSWORD_KDF_ITERATIONS, 32)
+    
+    with _derived_key_cache_lock:
+        _derived_key_cache[cache_key] = derived
+        if len(_derived_key_cache) > _DERIVED_KEY_CACHE_SIZE:
+            _derived_key_cache.popitem(last=False)
+            
+    return derived
+
 class DataEncryption:
     """Data encryption manager for Sentinair"""
     
@@ -18,6 +69,7 @@ class DataEncryption:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.fernet = None
+        self.file_cipher = None
         
         # Initialize encryption if enabled
         if config.get('security.encrypt_logs', True):
@@ -31,7 +83,7 @@ class DataEncryption:
             if os.path.exists(key_path):
                 with open(key_path, 'rb') as key_file:
                     key = key_file.read()
-                self.fernet = Fernet(key)
+                self._set_key(key)
                 self.logger.info("Encryption initialized successfully")
             else:
                 self.logger.warning(f"Encryption key not found at {key_path}")
@@ -55,14 +107,26 @@ class DataEncryption:
             # Set restrictive permissions
             os.chmod(key_path, 0o600)
             
-            self.fernet = Fernet(key)
+            self._set_key(key)
             self.logger.info("New encryption key generated and saved")
             
         except Exception as e:
             self.logger.error(f"Error generating encryption key: {e}")
             
+    def _set_key(self, key: bytes):
+        """Set up the Fernet cipher and the AES-256-GCM file cipher derived from the same key"""
+        self.fernet = Fernet(key)
+        
+        file_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b'sentinair-file-encryption',
+        ).derive(base64.urlsafe_b64decode(key))
+        self.file_cipher = AESGCM(file_key)
+            
     def encrypt(self, data: Union[str, bytes]) -> Optional[str]:
-        """Encrypt data and return base64 encoded string"""
+        """Encrypt data and return the URL-safe base64 Fernet token"""
         try:
             if not self.fernet:
                 return None
@@ -70,20 +134,24 @@ class DataEncryption:
             if isinstance(data, str):
                 data = data.encode('utf-8')
                 
-            encrypted_data = self.fernet.encrypt(data)
-            return base64.b64encode(encrypted_data).decode('utf-8')
+            # Fernet tokens are already base64, so no second encoding pass is needed
+            return self.fernet.encrypt(data).decode('ascii')
             
         except Exception as e:
             self.logger.error(f"Error encrypting data: {e}")
             return None
             
     def decrypt(self, encrypted_data: str) -> Optional[str]:
-        """Decrypt base64 encoded encrypted data"""
+        """Decrypt a Fernet token produced by encrypt"""
         try:
             if not self.fernet:
                 return None
                 
-            encrypted_bytes = base64.b64decode(encrypted_data.encode('utf-8'))
+            encrypted_bytes = encrypted_data.encode('ascii')
+            if not encrypted_data.startswith(_FERNET_TOKEN_PREFIX):
+                # Older releases wrapped the token in a second layer of base64
+                encrypted_bytes = base64.b64decode(encrypted_bytes)
+                
             decrypted_data = self.fernet.decrypt(encrypted_bytes)
             return decrypted_data.decode('utf-8')
             
@@ -92,21 +160,43 @@ class DataEncryption:
             return None
             
     def encrypt_file(self, file_path: str, output_path: str = None) -> bool:
-        """Encrypt a file"""
+        """Encrypt a file in fixed-size AES-GCM chunks"""
         try:
-            if not self.fernet:
+            if not self.file_cipher:
                 return False
                 
             if output_path is None:
                 output_path = file_path + '.encrypted'
                 
-            with open(file_path, 'rb') as input_file:
-                file_data = input_file.read()
-                
-            encrypted_data = self.fernet.encrypt(file_data)
-            
-            with open(output_path, 'wb') as output_file:
-                output_file.write(encrypted_data)
+            output_file, tmp_path = self._open_temp_output(output_path)
+            try:
+                with open(file_path, 'rb') as input_file, output_file:
+                    output_file.write(FILE_MAGIC)
+                    
+                    # Read one chunk ahead so the last chunk can be flagged as final
+                    index = 0
+                    chunk = input_file.read(FILE_CHUNK_SIZE)
+                    while True:
+                        next_chunk = input_file.read(FILE_CHUNK_SIZE)
+                        is_final = not next_chunk
+                        
+                        nonce = os.urandom(_NONCE_SIZE)
+                        aad = FILE_MAGIC + _CHUNK_AAD.pack(index, is_final)
+                        ciphertext = self.file_cipher.encrypt(nonce, chunk, aad)
+                        
+                        output_file.write(_FRAME_HEADER.pack(len(ciphertext)))
+                        output_file.write(nonce)
+                        output_file.write(ciphertext)
+                        
+                        if is_final:
+                            break
+                        chunk = next_chunk
+                        index += 1
+                        
+                os.replace(tmp_path, output_path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
                 
             self.logger.info(f"File encrypted: {file_path} -> {output_path}")
             return True
@@ -116,21 +206,29 @@ class DataEncryption:
             return False
             
     def decrypt_file(self, encrypted_file_path: str, output_path: str = None) -> bool:
-        """Decrypt a file"""
+        """Decrypt a file produced by encrypt_file (or a legacy single-blob Fernet file)"""
         try:
-            if not self.fernet:
+            if not self.file_cipher:
                 return False
                 
             if output_path is None:
                 output_path = encrypted_file_path.replace('.encrypted', '')
                 
-            with open(encrypted_file_path, 'rb') as encrypted_file:
-                encrypted_data = encrypted_file.read()
-                
-            decrypted_data = self.fernet.decrypt(encrypted_data)
-            
-            with open(output_path, 'wb') as output_file:
-                output_file.write(decrypted_data)
+            output_file, tmp_path = self._open_temp_output(output_path)
+            try:
+                with open(encrypted_file_path, 'rb') as encrypted_file, output_file:
+                    if encrypted_file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                        # Files written before chunked encryption are a single Fernet token
+                        encrypted_file.seek(0)
+                        output_file.write(self.fernet.decrypt(encrypted_file.read()))
+                    else:
+                        self._decrypt_frames(encrypted_file, output_file)
+                        
+                os.replace(tmp_path, output_path)
+            except Exception:
+                # Never leave partially decrypted (unauthenticated) output behind
+                os.remove(tmp_path)
+                raise
                 
             self.logger.info(f"File decrypted: {encrypted_file_path} -> {output_path}")
             return True
@@ -139,6 +237,37 @@ class DataEncryption:
             self.logger.error(f"Error decrypting file {encrypted_file_path}: {e}")
             return False
             
+    def _open_temp_output(self, output_path: str):
+        """Open a temporary file next to output_path, to be renamed over it once complete
+
+        Writing in place would truncate the input when both paths are the same file
+        """
+        directory, name = os.path.split(os.path.abspath(output_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+        return os.fdopen(fd, 'wb'), tmp_path
+        
+    def _decrypt_frames(self, encrypted_file, output_file):
+        """Decrypt and write every chunk frame following the file header"""
+        index = 0
+        header = encrypted_file.read(_FRAME_HEADER.size)
+        while header:
+            if len(header) != _FRAME_HEADER.size:
+                raise ValueError("Truncated chunk header")
+            (length,) = _FRAME_HEADER.unpack(header)
+            
+            nonce = encrypted_file.read(_NONCE_SIZE)
+            ciphertext = encrypted_file.read(length)
+            if len(nonce) != _NONCE_SIZE or len(ciphertext) != length:
+                raise ValueError("Truncated chunk")
+                
+            header = encrypted_file.read(_FRAME_HEADER.size)
+            aad = FILE_MAGIC + _CHUNK_AAD.pack(index, not header)
+            output_file.write(self.file_cipher.decrypt(nonce, ciphertext, aad))
+            index += 1
+            
+        if index == 0:
+            raise ValueError("Encrypted file contains no chunks")
+            
     def is_encryption_enabled(self) -> bool:
         """Check if encryption is enabled and available"""
         return self.fernet is not None
@@ -152,14 +281,22 @@ class DataEncryption:
             # Get file size
             file_size = os.path.getsize(file_path)
             
-            # Overwrite with random data multiple times
+            # Overwrite with random data multiple times, one bounded chunk at a time
             with open(file_path, 'r+b') as file:
-                for _ in range(3):  # Overwrite 3 times
+                for _ in range(SECURE_DELETE_PASSES):
                     file.seek(0)
-                    file.write(os.urandom(file_size))
+                    remaining = file_size
+                    while remaining:
+                        chunk_size = min(SECURE_DELETE_CHUNK_SIZE, remaining)
+                        file.write(os.urandom(chunk_size))
+                        remaining -= chunk_size
                     file.flush()
                     os.fsync(file.fileno())
                     
+                # The overwritten pages will not be read again; keep them out of the page cache
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(file.fileno(), 0, file_size, os.POSIX_FADV_DONTNEED)
+                    
             # Finally delete the file
             os.remove(file_path)
             
@@ -176,14 +313,7 @@ class DataEncryption:
             if salt is None:
                 salt = os.urandom(32)
                 
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            
-            key = kdf.derive(password.encode('utf-8'))
+            key = _derive_password_key(password.encode('utf-8'), salt)
             hash_value = base64.b64encode(key).decode('utf-8')
             salt_value = base64.b64encode(salt).decode('utf-8')
             
@@ -199,15 +329,8 @@ class DataEncryption:
             salt = base64.b64decode(salt_value.encode('utf-8'))
             stored_hash = base64.b64decode(hash_value.encode('utf-8'))
             
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            
-            kdf.verify(password.encode('utf-8'), stored_hash)
-            return True
+            derived = _derive_password_key(password.encode('utf-8'), salt)
+            return hmac.compare_digest(derived, stored_hash)
             
         except Exception as e:
             self.logger.debug(f"Password verification failed: {e}")
@@ -4,9 +4,17 @@ Utility to clean datetime objects from event data before JSON serialization
 """
 
 import json
+import dataclasses
 from datetime import datetime
 from typing import Any, Dict, List, Union
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 def sanitize_datetime_objects(obj: Any) -> Any:
     """
     Recursively convert datetime objects to ISO format strings
@@ -25,22 +33,87 @@ def sanitize_datetime_objects(obj: Any) -> Any:
 def safe_json_dumps(obj: Any, **kwargs) -> str:
     """
     Safely serialize object to JSON, converting datetime objects automatically
+
+    Datetimes are handled during the encoder's own walk, so the object tree is
+    not copied beforehand. orjson is used when installed and no json.dumps
+    formatting options are requested; note that it writes NaN and infinities
+    as null, where json.dumps writes the non-standard NaN/Infinity tokens
+    """
+    if ORJSON_AVAILABLE and not kwargs:
+        try:
+            return orjson.dumps(
+                obj,
+                default=_convert_non_native,
+                option=_ORJSON_OPTIONS
+            ).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which json.dumps can still encode
+            pass
+            
+    kwargs.setdefault('cls', DateTimeEncoder)
+    return json.dumps(obj, **kwargs)
+
+def safe_json_dumpb(obj: Any) -> bytes:
+    """
+    Serialize object to UTF-8 JSON bytes, converting datetime objects automatically
+
+    With orjson installed the bytes are returned as produced, without a str round-trip
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(
+                obj,
+                default=_convert_non_native,
+                option=_ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            pass
+            
+    return json.dumps(obj, cls=DateTimeEncoder).encode('utf-8')
+
+def safe_json_loads(data: Union[str, bytes]) -> Any:
     """
-    sanitized_obj = sanitize_datetime_objects(obj)
-    return json.dumps(sanitized_obj, **kwargs)
+    Parse JSON text, using orjson when installed
+
+    Text orjson rejects, such as the NaN/Infinity tokens json.dumps writes,
+    is parsed again with json.loads
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+def _convert_non_native(obj: Any) -> Any:
+    """
+    Convert a value the JSON encoders cannot serialize natively
+
+    Returned containers are walked by the calling encoder, so nested datetimes
+    are converted in the same pass
+    """
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    elif isinstance(obj, float):
+        # orjson only encodes exact float/int natively; subclasses must not reach __dict__
+        return float(obj)
+    elif isinstance(obj, int):
+        return int(obj)
+    elif hasattr(obj, '__json__'):
+        # Objects can provide their own JSON-ready representation
+        return obj.__json__()
+    elif hasattr(obj, 'to_dict'):
+        # Handle objects with to_dict method
+        return obj.to_dict()
+    elif hasattr(obj, '__dict__'):
+        # Handle custom objects by converting to dict
+        return obj.__dict__
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 class DateTimeEncoder(json.JSONEncoder):
     """Enhanced JSON encoder that handles datetime and other non-serializable objects"""
     
     def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        elif hasattr(obj, '__dict__'):
-            # Handle custom objects by converting to dict
-            return sanitize_datetime_objects(obj.__dict__)
-        elif hasattr(obj, 'to_dict'):
-            # Handle objects with to_dict method
-            return sanitize_datetime_objects(obj.to_dict())
-        else:
-            # Let the base class default method raise the TypeError
-            return super().default(obj)
+        return _convert_non_native(obj)
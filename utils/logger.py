@@ -3,77 +3,377 @@ Logging configuration and utilities for Sentinair
 """
 
 import os
+import time
+import queue
+import atexit
 import logging
 import logging.handlers
-from datetime import datetime
+import threading
+from collections import deque
 from pathlib import Path
+from .json_utils import safe_json_dumpb
 
-def setup_logging(log_level: str = "INFO", log_dir: str = "data/logs"):
-    """Setup logging configuration for Sentinair"""
+# Records are written to disk by a single listener thread so callers never block on file I/O
+LOG_QUEUE_SIZE = 20000
+LOG_WRITE_BATCH = 64  # records drained per listener wakeup
+_listener = None
+
+# Log directories already created by this process
+_ensured_dirs = set()
+
+# Audit events are written in batches once this many are pending or the interval elapses
+AUDIT_BATCH_SIZE = 256
+AUDIT_FLUSH_INTERVAL = 0.2  # seconds
+
+class _ExcludeFilter(logging.Filter):
+    """Reject records from the named logger and its children"""
+    
+    def filter(self, record):
+        return not super().filter(record)
+
+class FastFormatter(logging.Formatter):
+    """Fixed-layout formatter that renders asctime once per second"""
+    
+    def __init__(self, detailed: bool = True):
+        super().__init__()
+        self.detailed = detailed
+        self._asctime_cache = (None, '')
+        
+    def format(self, record):
+        message = record.getMessage()
+        
+        if self.detailed:
+            second = int(record.created)
+            cached_second, asctime = self._asctime_cache
+            if second != cached_second:
+                asctime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+                self._asctime_cache = (second, asctime)
+            message = f"{asctime},{int(record.msecs):03d} - {record.name} - {record.levelname} - {message}"
+        else:
+            message = f"{record.levelname}: {message}"
+            
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            message = f"{message}\n{record.exc_text}"
+        if record.stack_info:
+            message = f"{message}\n{self.formatStack(record.stack_info)}"
+            
+        return message
+
+class FastRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler that buffers encoded records and writes them straight to the file descriptor"""
+    
+    # Buffered records are written once this many bytes are pending or the oldest is this old
+    BUFFER_SIZE = 64 * 1024
+    FLUSH_INTERVAL = 0.1  # seconds
+    
+    # Bytes in the current file: read once when it is opened, then counted per write
+    _size = 0
+    
+    def __init__(self, *args, **kwargs):
+        self._pending = bytearray()
+        self._pending_since = 0.0
+        super().__init__(*args, **kwargs)
+        
+    def emit(self, record):
+        """Format and append a single record"""
+        try:
+            self._write((self.format(record) + self.terminator).encode(self.encoding or 'utf-8'))
+        except Exception:
+            self.handleError(record)
+            
+    def handle_batch(self, records):
+        """Filter, format and append a batch of records"""
+        records = [record for record in records if record.levelno >= self.level and self.filter(record)]
+        if not records:
+            return
+            
+        self.acquire()
+        try:
+            data = ''.join(self.format(record) + self.terminator for record in records)
+            self._write(data.encode(self.encoding or 'utf-8'))
+        except Exception:
+            self.handleError(records[0])
+        finally:
+            self.release()
+            
+    def _open(self):
+        """Open the log file and record its current size"""
+        stream = super()._open()
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+        
+    def _write(self, data: bytes):
+        """Buffer encoded records, writing them out on size or age"""
+        now = time.monotonic()
+        if not self._pending:
+            self._pending_since = now
+        self._pending += data
+        
+        if len(self._pending) >= self.BUFFER_SIZE or now - self._pending_since >= self.FLUSH_INTERVAL:
+            self._write_pending()
+            
+    def _write_pending(self, length: int = None):
+        """Rotate if needed, then write the first length buffered bytes (default all) with os.write"""
+        if not self._pending:
+            return
+        if length is None:
+            length = len(self._pending)
+            
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+                
+            if self.maxBytes > 0 and self._size > 0 and self._size + length > self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                    
+            # Bypass the buffered text wrapper; the file is opened in append mode
+            with memoryview(self._pending) as pending:
+                os.write(self.stream.fileno(), pending[:length])
+            self._size += length
+        finally:
+            del self._pending[:length]
+            
+    def flush(self):
+        """Write out any buffered records"""
+        self.acquire()
+        try:
+            self._write_pending()
+        except Exception:
+            self.handleError(None)
+        finally:
+            self.release()
+            
+    def close(self):
+        """Write out buffered records, then close the file"""
+        self.flush()
+        super().close()
+
+class _JsonLines:
+    """Log message carrying pre-serialized JSON lines, decoded only if a text handler needs it"""
+    
+    __slots__ = ('data',)
+    
+    def __init__(self, data: bytes):
+        self.data = data
+        
+    def __str__(self):
+        return self.data.decode('utf-8')
+
+class BytesAuditHandler(FastRotatingFileHandler):
+    """Append-only audit handler that writes pre-serialized JSON lines in whole 4 KiB blocks"""
+    
+    BLOCK_SIZE = 4096
+    FILE_MODE = 0o640
+    
+    def _open(self):
+        """Open the audit log with O_APPEND, readable by owner and group only"""
+        stream = open(
+            self.baseFilename,
+            self.mode,
+            encoding=self.encoding,
+            errors=getattr(self, 'errors', None),  # FileHandler.errors is Python 3.9+
+            opener=lambda path, flags: os.open(path, flags, self.FILE_MODE)
+        )
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+        
+    def emit(self, record):
+        """Append the record's bytes, or its formatted text for ordinary records"""
+        try:
+            if isinstance(record.msg, _JsonLines):
+                self._pending += record.msg.data
+            else:
+                self._pending += self.format(record).encode(self.encoding or 'utf-8')
+            self._pending += b"\n"
+            
+            # Write full blocks now; the remainder waits for more records or flush()
+            if len(self._pending) >= self.BLOCK_SIZE:
+                self._write_pending(len(self._pending) - len(self._pending) % self.BLOCK_SIZE)
+        except Exception:
+            self.handleError(record)
+            
+    def _write_pending(self, length: int = None):
+        """Re-read the file size before writing; other processes may append to the audit log"""
+        if self._pending and self.stream is not None:
+            self._size = os.fstat(self.stream.fileno()).st_size
+        super()._write_pending(length)
+
+class _RecordQueue:
+    """Bounded deque with the put_nowait/get interface QueueHandler and QueueListener use
+
+    Producers append without taking a lock and only signal the listener when it may be waiting.
+    When full, the oldest record is dropped.
+    """
+    
+    def __init__(self, maxlen: int):
+        self._records = deque(maxlen=maxlen)
+        self._ready = threading.Event()
+        
+    def put_nowait(self, record):
+        self._records.append(record)
+        if not self._ready.is_set():
+            self._ready.set()
+            
+    def get(self, block: bool = True):
+        while True:
+            try:
+                return self._records.popleft()
+            except IndexError:
+                if not block:
+                    raise queue.Empty
+                    
+            # Clear before re-checking so an append racing with the clear still wakes us
+            self._ready.clear()
+            if not self._records:
+                self._ready.wait()
+
+class _BatchQueueListener(logging.handlers.QueueListener):
+    """QueueListener that drains queued records and hands them to handlers in batches"""
+    
+    def handle_batch(self, records):
+        """Pass a batch of records to every handler"""
+        records = [self.prepare(record) for record in records]
+        for handler in self.handlers:
+            handler.handle_batch(records)
+            
+    def _monitor(self):
+        """Block for the next record, then take whatever else is already queued"""
+        while True:
+            try:
+                record = self.dequeue(False)
+            except queue.Empty:
+                # Nothing more is coming right now, so push buffered output to disk
+                for handler in self.handlers:
+                    handler.flush()
+                record = self.dequeue(True)
+                
+            batch = [record]
+            while len(batch) < LOG_WRITE_BATCH and batch[-1] is not self._sentinel:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+                    
+            stopping = batch[-1] is self._sentinel
+            if stopping:
+                batch.pop()
+            if batch:
+                self.handle_batch(batch)
+            if stopping:
+                break
+
+def _ensure_dir(path: str):
+    """Create a log directory once per process"""
+    if path not in _ensured_dirs:
+        Path(path).mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(path)
+
+def _stop_listener():
+    """Drain queued records and stop the log listener thread"""
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(_stop_listener)
+
+# Shared by every handler setup_logging creates
+_DETAILED_FORMATTER = FastFormatter(detailed=True)
+_SIMPLE_FORMATTER = FastFormatter(detailed=False)
+
+def setup_logging(log_level: str = "INFO", log_dir: str = "data/logs", force: bool = False):
+    """Setup logging configuration for Sentinair; repeat calls are no-ops unless force is set"""
+    global _listener
     
+    if _listener is not None and not force:
+        return
+        
     # Create log directory
-    Path(log_dir).mkdir(parents=True, exist_ok=True)
+    _ensure_dir(log_dir)
     
     # Configure logging level
     level = getattr(logging, log_level.upper(), logging.INFO)
     
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    simple_formatter = logging.Formatter(
-        '%(levelname)s: %(message)s'
-    )
-    
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
     
     # Clear existing handlers
     root_logger.handlers.clear()
+    _stop_listener()
     
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(level)
-    console_handler.setFormatter(simple_formatter)
+    console_handler.setFormatter(_SIMPLE_FORMATTER)
     root_logger.addHandler(console_handler)
     
     # File handler with rotation
     log_file = os.path.join(log_dir, "sentinair.log")
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = FastRotatingFileHandler(
         log_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=5
+        backupCount=5,
+        delay=True,
+        encoding='utf-8'
     )
     file_handler.setLevel(level)
-    file_handler.setFormatter(detailed_formatter)
-    root_logger.addHandler(file_handler)
+    file_handler.setFormatter(_DETAILED_FORMATTER)
     
     # Error log file
     error_log_file = os.path.join(log_dir, "sentinair_errors.log")
-    error_handler = logging.handlers.RotatingFileHandler(
+    error_handler = FastRotatingFileHandler(
         error_log_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=3
+        backupCount=3,
+        delay=True,
+        encoding='utf-8'
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(detailed_formatter)
-    root_logger.addHandler(error_handler)
+    error_handler.setFormatter(_DETAILED_FORMATTER)
     
     # Security events log
     security_log_file = os.path.join(log_dir, "security_events.log")
-    security_handler = logging.handlers.RotatingFileHandler(
+    security_handler = FastRotatingFileHandler(
         security_log_file,
         maxBytes=50 * 1024 * 1024,  # 50MB
-        backupCount=10
+        backupCount=10,
+        delay=True,
+        encoding='utf-8'
     )
     security_handler.setLevel(logging.INFO)
-    security_handler.setFormatter(detailed_formatter)
+    security_handler.setFormatter(_DETAILED_FORMATTER)
+    
+    # The listener sees both loggers' records, so route each to its own files
+    file_handler.addFilter(_ExcludeFilter('security'))
+    file_handler.addFilter(lambda record: record.levelno < logging.ERROR)  # errors go to the error log only
+    error_handler.addFilter(_ExcludeFilter('security'))
+    security_handler.addFilter(logging.Filter('security'))
+    
+    log_queue = _RecordQueue(LOG_QUEUE_SIZE)
+    _listener = _BatchQueueListener(
+        log_queue,
+        file_handler,
+        error_handler,
+        security_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
+    
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    root_logger.addHandler(queue_handler)
     
     # Create security logger
     security_logger = logging.getLogger('security')
-    security_logger.addHandler(security_handler)
+    security_logger.handlers.clear()
+    security_logger.addHandler(queue_handler)
     security_logger.setLevel(logging.INFO)
     security_logger.propagate = False  # Don't propagate to root logger
     
@@ -84,24 +384,51 @@ def get_security_logger():
     return logging.getLogger('security')
 
 class SecurityAuditLogger:
-    """Special logger for security audit events"""
+    """Special logger for security audit events, shared as a process-wide singleton"""
     
-    def __init__(self, log_dir: str = "data/logs"):
+    _instance = None
+    _instance_lock = threading.Lock()
+    
+    def __new__(cls, log_dir: str = "data/logs"):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance._init(log_dir)
+                cls._instance = instance
+            return cls._instance
+            
+    def _init(self, log_dir: str):
+        """One-time setup of the audit logger, its buffer and its handler"""
         self.logger = logging.getLogger('security_audit')
         self.log_dir = log_dir
         
+        # Pending JSON lines and a reusable record dict, both guarded by _lock
+        self._buffer = deque(maxlen=AUDIT_BATCH_SIZE * 2)
+        self._scratch = {}
+        self._lock = threading.RLock()
+        self._flush_timer = None
+        atexit.register(self.flush)
+        
         if not self.logger.handlers:
             self._setup_audit_logger()
-            
+        self.reload_level()
+        
+    def reload_level(self):
+        """Re-read whether INFO audit events are enabled after the logger level changes"""
+        self._enabled = self.logger.isEnabledFor(logging.INFO)
+        
     def _setup_audit_logger(self):
         """Setup audit logging"""
+        _ensure_dir(self.log_dir)
         audit_log_file = os.path.join(self.log_dir, "audit.log")
         
         # Create audit log handler with strict rotation
-        audit_handler = logging.handlers.RotatingFileHandler(
+        audit_handler = BytesAuditHandler(
             audit_log_file,
             maxBytes=100 * 1024 * 1024,  # 100MB
-            backupCount=20
+            backupCount=20,
+            delay=True,
+            encoding='utf-8'
         )
         
         # Detailed audit formatter
@@ -115,34 +442,101 @@ class SecurityAuditLogger:
         self.logger.propagate = False
         
     def log_event(self, event_type: str, details: dict):
-        """Log security audit event"""
+        """Queue a security audit event for the next batched write"""
+        if not self._enabled:
+            return
+            
+        with self._lock:
+            record = self._scratch
+            record.clear()
+            record['type'] = event_type
+            # Nested so caller keys such as 'type' or 'ts' cannot clobber the envelope
+            record['details'] = details
+            self._emit(record)
+            
+    def _emit(self, record: dict):
+        """Serialize a record into the write buffer; the caller must hold _lock"""
+        # Event time as integer Unix epoch nanoseconds
+        record['ts'] = time.time_ns()
+        
         try:
-            message = f"{event_type}: {details}"
-            self.logger.info(message)
+            self._buffer.append(safe_json_dumpb(record))
         except Exception as e:
             # Fallback to standard logging
             logging.error(f"Failed to log audit event: {e}")
+            return
+            
+        # A full batch is handed over now; the timer still flushes the handler's tail
+        if len(self._buffer) >= AUDIT_BATCH_SIZE:
+            self._write_batch()
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(AUDIT_FLUSH_INTERVAL, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+            
+    def flush(self):
+        """Write all pending audit events through to the audit file"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+                
+            self._write_batch()
+            for handler in self.logger.handlers:
+                handler.flush()
+                
+    def _write_batch(self):
+        """Hand pending audit events to the handlers as a single log record; the caller must hold _lock"""
+        if not self._buffer:
+            return
+            
+        try:
+            # One compact JSON object per line, passed through to the handler as bytes
+            message = _JsonLines(b"\n".join(self._buffer))
+            self.logger.handle(self.logger.makeRecord(
+                self.logger.name, logging.INFO, __file__, 0, message, None, None
+            ))
+        except Exception as e:
+            # Fallback to standard logging
+            logging.error(f"Failed to log audit event: {e}")
+        finally:
+            self._buffer.clear()
             
     def log_anomaly_detection(self, confidence: float, event_data: dict):
         """Log anomaly detection event"""
-        self.log_event("ANOMALY_DETECTED", {
-            'confidence': confidence,
-            'timestamp': datetime.now().isoformat(),
-            'event_data': event_data
-        })
-        
+        if not self._enabled:
+            return
+            
+        with self._lock:
+            record = self._scratch
+            record.clear()
+            record['type'] = "ANOMALY_DETECTED"
+            record['confidence'] = confidence
+            record['event_data'] = event_data
+            self._emit(record)
+            
     def log_admin_access(self, action: str, success: bool):
         """Log admin access attempt"""
-        self.log_event("ADMIN_ACCESS", {
-            'action': action,
-            'success': success,
-            'timestamp': datetime.now().isoformat()
-        })
-        
+        if not self._enabled:
+            return
+            
+        with self._lock:
+            record = self._scratch
+            record.clear()
+            record['type'] = "ADMIN_ACCESS"
+            record['action'] = action
+            record['success'] = success
+            self._emit(record)
+            
     def log_system_event(self, event_type: str, details: dict):
         """Log system-level security event"""
-        self.log_event("SYSTEM_EVENT", {
-            'event_type': event_type,
-            'details': details,
-            'timestamp': datetime.now().isoformat()
-        })
+        if not self._enabled:
+            return
+            
+        with self._lock:
+            record = self._scratch
+            record.clear()
+            record['type'] = "SYSTEM_EVENT"
+            record['event_type'] = event_type
+            record['details'] = details
+            self._emit(record)